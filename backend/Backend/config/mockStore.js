@@ -8,6 +8,14 @@ class MockStore {
     this.users = new Map();
     this.history = [];
 
+    // Lowercased username / email / wallet -> user id, so lookups skip a full scan of users
+    this.usernameIndex = new Map();
+    this.emailIndex = new Map();
+    this.walletIndex = new Map();
+
+    // One timestamp shared by every seed record
+    const seededAt = new Date().toISOString();
+
     // Seed initial demo user
     const demoUser = {
       id: 'demo-user-uuid-1001',
@@ -15,8 +23,8 @@ class MockStore {
       email: 'demo@nexacred.com',
       password_hash: DEMO_PASSWORD_HASH,
       wallet_address: '0x1234567890abcdef1234567890abcdef12345678',
-      wallet_connected_at: new Date().toISOString(),
-      last_wallet_activity: new Date().toISOString(),
+      wallet_connected_at: seededAt,
+      last_wallet_activity: seededAt,
       first_name: 'Demo',
       last_name: 'User',
       date_of_birth: '1995-05-15',
@@ -44,10 +52,10 @@ class MockStore {
       consent_credit_bureau: true,
       age_verified: true,
       itr_status: 'Filed ITR in past 2 years',
-      created_at: new Date().toISOString()
+      created_at: seededAt
     };
 
-    this.users.set(demoUser.id, demoUser);
+    this.storeUser(demoUser);
 
     // Seed second demo lender account
     const lenderUser = {
@@ -56,8 +64,8 @@ class MockStore {
       email: 'lender@nexacred.com',
       password_hash: DEMO_PASSWORD_HASH,
       wallet_address: '0x9876543210fedcba9876543210fedcba98765432',
-      wallet_connected_at: new Date().toISOString(),
-      last_wallet_activity: new Date().toISOString(),
+      wallet_connected_at: seededAt,
+      last_wallet_activity: seededAt,
       first_name: 'Capital',
       last_name: 'Lender',
       date_of_birth: '1990-01-01',
@@ -85,10 +93,10 @@ class MockStore {
       consent_credit_bureau: true,
       age_verified: true,
       itr_status: 'Filed ITR in past 2 years',
-      created_at: new Date().toISOString()
+      created_at: seededAt
     };
 
-    this.users.set(lenderUser.id, lenderUser);
+    this.storeUser(lenderUser);
 
     // Seed initial demo borrowing history
     this.history.push({
@@ -105,25 +113,53 @@ class MockStore {
     });
   }
 
+  indexUser(user) {
+    // First registration wins, matching the old first-match scan order
+    const add = (index, value) => {
+      if (!value) return;
+      const key = value.toLowerCase();
+      if (!index.has(key)) index.set(key, user.id);
+    };
+    add(this.usernameIndex, user.username);
+    add(this.emailIndex, user.email);
+    add(this.walletIndex, user.wallet_address);
+  }
+
+  unindexUser(user) {
+    const remove = (index, value) => {
+      if (!value) return;
+      const key = value.toLowerCase();
+      if (index.get(key) === user.id) index.delete(key);
+    };
+    remove(this.usernameIndex, user.username);
+    remove(this.emailIndex, user.email);
+    remove(this.walletIndex, user.wallet_address);
+  }
+
+  storeUser(user) {
+    const existing = this.users.get(user.id);
+    if (existing) this.unindexUser(existing);
+    this.users.set(user.id, user);
+    this.indexUser(user);
+    return user;
+  }
+
+  findIndexedUser(index, value) {
+    if (!value) return null;
+    const id = index.get(value.toLowerCase());
+    return id ? this.users.get(id) || null : null;
+  }
+
   findUserByUsername(username) {
-    if (!username) return null;
-    return Array.from(this.users.values()).find(
-      u => u.username.toLowerCase() === username.toLowerCase()
-    ) || null;
+    return this.findIndexedUser(this.usernameIndex, username);
   }
 
   findUserByEmail(email) {
-    if (!email) return null;
-    return Array.from(this.users.values()).find(
-      u => u.email.toLowerCase() === email.toLowerCase()
-    ) || null;
+    return this.findIndexedUser(this.emailIndex, email);
   }
 
   findUserByWallet(walletAddress) {
-    if (!walletAddress) return null;
-    return Array.from(this.users.values()).find(
-      u => u.wallet_address && u.wallet_address.toLowerCase() === walletAddress.toLowerCase()
-    ) || null;
+    return this.findIndexedUser(this.walletIndex, walletAddress);
   }
 
   findUserById(id) {
@@ -137,16 +173,21 @@ class MockStore {
       id,
       created_at: userData.created_at || new Date().toISOString()
     };
-    this.users.set(id, user);
-    return user;
+    return this.storeUser(user);
   }
 
   updateUser(id, updateData) {
     const existing = this.users.get(id);
     if (!existing) return null;
-    const updated = { ...existing, ...updateData };
-    this.users.set(id, updated);
-    return updated;
+    return this.storeUser({ ...existing, ...updateData });
+  }
+
+  deleteUser(id) {
+    const existing = this.users.get(id);
+    if (!existing) return null;
+    this.unindexUser(existing);
+    this.users.delete(id);
+    return existing;
   }
 
   getHistoryByUserId(userId) {
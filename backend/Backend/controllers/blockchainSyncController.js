@@ -1,4 +1,3 @@
-import { ethers } from "ethers";
 import dotenv from "dotenv";
 import supabase from "../config/supabaseClient.js";
 
@@ -14,8 +13,15 @@ const NEXACRED_ABI = [
   "function getLoan(uint256 loanId) external view returns (tuple(uint256 id, address borrower, address lender, uint256 amount, uint256 interestRate, uint256 durationDays, uint256 creditScore, string purpose, uint8 status, uint256 createdAt, uint256 fundedAt, uint256 dueDate, uint256 totalOwed, uint256 amountRepaid))"
 ];
 
+// ethers is loaded on first use so importing this controller (via riskRoutes) stays cheap at cold start
+const loadEthers = async () => (await import("ethers")).ethers;
+
+// Provider/contract pair shared across requests so network detection and the
+// RPC connection are set up once rather than on every sync or oracle push
+let cachedConnection = null;
+
 // Helper to get active ethers contract instance
-const getContract = () => {
+const getContract = async () => {
   const providerUrl = process.env.WEB3_PROVIDER_URL;
   const contractAddress = process.env.NEXACRED_CONTRACT_ADDRESS;
 
@@ -23,10 +29,16 @@ const getContract = () => {
     return { contract: null, provider: null };
   }
 
+  if (cachedConnection && cachedConnection.providerUrl === providerUrl && cachedConnection.contractAddress === contractAddress) {
+    return cachedConnection;
+  }
+
   try {
+    const ethers = await loadEthers();
     const provider = new ethers.JsonRpcProvider(providerUrl);
     const contract = new ethers.Contract(contractAddress, NEXACRED_ABI, provider);
-    return { contract, provider };
+    cachedConnection = { contract, provider, providerUrl, contractAddress };
+    return cachedConnection;
   } catch (error) {
     console.error("Failed to initialize ethers provider/contract:", error.message);
     return { contract: null, provider: null };
@@ -35,16 +47,64 @@ const getContract = () => {
 
 import mockStore from "../config/mockStore.js";
 
+// Blockchain numeric LoanStatus enum -> database status string, built once at load
+const LOAN_STATUS_MAP = {
+  0: "pending",   // PENDING
+  1: "approved",  // FUNDED
+  2: "completed", // REPAID
+  3: "defaulted", // DEFAULTED
+  4: "rejected"   // CANCELLED
+};
+
 // Map blockchain numeric LoanStatus enum to database status string
-const mapBlockchainStatus = (statusNum) => {
-  const statusMap = {
-    0: "pending",   // PENDING
-    1: "approved",  // FUNDED
-    2: "completed", // REPAID
-    3: "defaulted", // DEFAULTED
-    4: "rejected"   // CANCELLED
+const mapBlockchainStatus = (statusNum) => LOAN_STATUS_MAP[statusNum] || "pending";
+
+// Cap on concurrent getLoan calls so a sync stays under public RPC rate limits
+const LOAN_FETCH_CONCURRENCY = 4;
+
+// Run fn over items with at most `limit` calls in flight; results keep the input order
+const mapWithConcurrency = async (items, limit, fn) => {
+  const results = new Array(items.length);
+  let next = 0;
+  const worker = async () => {
+    while (next < items.length) {
+      const i = next++;
+      results[i] = await fn(items[i]);
+    }
   };
-  return statusMap[statusNum] || "pending";
+  await Promise.all(Array.from({ length: Math.min(limit, items.length) }, worker));
+  return results;
+};
+
+// Resolve user UUIDs for wallet addresses not yet in addressToIdMap (keyed by lowercase address).
+// Addresses are matched in both lowercase (wallet sign-in) and checksummed (event args) form.
+const resolveUserIds = async (addresses, addressToIdMap, ethers) => {
+  const walletVariants = [];
+  for (const address of addresses) {
+    if (addressToIdMap[address.toLowerCase()]) continue;
+    walletVariants.push(address.toLowerCase(), ethers.getAddress(address));
+  }
+  if (walletVariants.length === 0) return;
+
+  try {
+    const { data: dbUsers, error: usersError } = await supabase
+      .from('users')
+      .select('id, wallet_address')
+      .in('wallet_address', walletVariants);
+    if (usersError) throw usersError;
+    dbUsers.forEach(u => {
+      if (u.wallet_address) {
+        addressToIdMap[u.wallet_address.toLowerCase()] = u.id;
+      }
+    });
+  } catch (dbErr) {
+    console.warn("Supabase unreachable. Fetching users from Local MockStore:", dbErr.message);
+    Array.from(mockStore.users.values()).forEach(u => {
+      if (u.wallet_address) {
+        addressToIdMap[u.wallet_address.toLowerCase()] = u.id;
+      }
+    });
+  }
 };
 
 /**
@@ -63,79 +123,104 @@ export const syncUserEvents = async (req, res) => {
       return res.status(403).json({ error: "Access denied. You can only sync your own wallet events." });
     }
 
-    const { contract } = getContract();
+    const { contract } = await getContract();
     if (!contract) {
       return res.status(503).json({ 
         success: false, 
         message: "Blockchain provider or contract address is not configured. Sync skipped." 
       });
     }
+    const ethers = await loadEthers();
 
     const normalizedAddress = walletAddress.toLowerCase();
     console.log(`Starting on-chain event sync for address: ${normalizedAddress}`);
 
-    // Query active database users to fetch UUID mappings for borrower and lender
+    // Fetch LoanRequested (user as borrower) and LoanFunded (user as lender) events concurrently
+    const requestedFilter = contract.filters.LoanRequested(null, walletAddress);
+    const fundedFilter = contract.filters.LoanFunded(null, walletAddress);
+    const [requestedEvents, fundedEvents] = await Promise.all([
+      contract.queryFilter(requestedFilter, -5000), // Scan last 5000 blocks
+      contract.queryFilter(fundedFilter, -5000)
+    ]);
+
+    // Resolve UUIDs only for the wallets these events mention rather than reading every user
     const addressToIdMap = {};
-    try {
-      const { data: dbUsers, error: usersError } = await supabase
-        .from('users')
-        .select('id, wallet_address');
-      if (usersError) throw usersError;
-      dbUsers.forEach(u => {
-        if (u.wallet_address) {
-          addressToIdMap[u.wallet_address.toLowerCase()] = u.id;
-        }
-      });
-    } catch (dbErr) {
-      console.warn("Supabase unreachable. Fetching users from Local MockStore:", dbErr.message);
-      Array.from(mockStore.users.values()).forEach(u => {
-        if (u.wallet_address) {
-          addressToIdMap[u.wallet_address.toLowerCase()] = u.id;
-        }
-      });
+    const eventAddresses = new Set();
+    for (const event of requestedEvents) eventAddresses.add(event.args[1]);
+    for (const event of fundedEvents) {
+      eventAddresses.add(event.args[1]);
+      eventAddresses.add(event.args[2]);
     }
+    await resolveUserIds(eventAddresses, addressToIdMap, ethers);
 
-    // 1. Fetch LoanRequested events where user is borrower
-    const requestedFilter = contract.filters.LoanRequested(null, walletAddress);
-    const requestedEvents = await contract.queryFilter(requestedFilter, -5000); // Scan last 5000 blocks
+    // Only events whose parties are registered get synced, so only their loans are fetched
+    const relevantRequested = requestedEvents.filter(event => addressToIdMap[event.args[1].toLowerCase()]);
+    const relevantFunded = fundedEvents.filter(event =>
+      addressToIdMap[event.args[1].toLowerCase()] && addressToIdMap[event.args[2].toLowerCase()]
+    );
+
+    // Fetch current on-chain loan state with bounded concurrency; a failed lookup skips only that loan
+    const loanIds = Array.from(new Set([...relevantRequested, ...relevantFunded].map(event => Number(event.args[0]))));
+    const loanEntries = await mapWithConcurrency(loanIds, LOAN_FETCH_CONCURRENCY, async loanId => {
+      try {
+        return [loanId, await contract.getLoan(loanId)];
+      } catch (err) {
+        console.error(`Failed to fetch on-chain loan ${loanId}:`, err.message);
+        return null;
+      }
+    });
+    const loansById = new Map(loanEntries.filter(Boolean));
+
+    // Lenders of requested loans are only known once the loans are fetched
+    const lenderAddresses = new Set();
+    for (const loan of loansById.values()) {
+      if (loan.lender !== ethers.ZeroAddress) lenderAddresses.add(loan.lender);
+    }
+    await resolveUserIds(lenderAddresses, addressToIdMap, ethers);
 
-    for (const event of requestedEvents) {
+    // Find which requested loans are already synced with one query instead of one per event
+    const requestedLoanIds = relevantRequested.map(event => Number(event.args[0]));
+    const syncedLoanIds = new Set();
+    if (requestedLoanIds.length > 0) {
+      const { data: syncedRecords } = await supabase
+        .from('history')
+        .select('blockchain_loan_id')
+        .in('blockchain_loan_id', requestedLoanIds);
+      (syncedRecords || []).forEach(r => syncedLoanIds.add(Number(r.blockchain_loan_id)));
+    }
+
+    // 1. Sync LoanRequested events where user is borrower
+    const newRecords = [];
+    for (const event of relevantRequested) {
       const loanId = Number(event.args[0]);
       const borrowerAddr = event.args[1].toLowerCase();
       const amount = parseFloat(ethers.formatEther(event.args[2]));
       const purpose = event.args[3];
 
       const borrowerId = addressToIdMap[borrowerAddr];
-      if (!borrowerId) continue; // Borrower not registered in DB
 
-      // Fetch actual current status from blockchain to capture funding/repayments
-      const blockchainLoan = await contract.getLoan(loanId);
+      // Current status from blockchain captures funding/repayments
+      const blockchainLoan = loansById.get(loanId);
+      if (!blockchainLoan) continue; // On-chain lookup failed; retried on the next sync
       const blockchainStatus = mapBlockchainStatus(Number(blockchainLoan.status));
       const lenderAddr = blockchainLoan.lender.toLowerCase();
       const lenderId = addressToIdMap[lenderAddr] || null;
 
-      // Check if record exists
-      const { data: existingRecord } = await supabase
-        .from('history')
-        .select('id')
-        .eq('blockchain_loan_id', loanId)
-        .maybeSingle();
+      if (!syncedLoanIds.has(loanId)) {
+        // history.lender is NOT NULL, so a loan with no registered lender (e.g. still unfunded
+        // on-chain) can't be stored yet; a later sync can record it once the loan is funded
+        if (!lenderId) continue;
 
-      if (!existingRecord) {
-        // Insert new synced record
-        const { error: insertError } = await supabase
-          .from('history')
-          .insert([{
-            borrower: borrowerId,
-            lender: lenderId || null, // Null if unfunded on-chain yet
-            amount: amount,
-            type: 'borrow',
-            status: blockchainStatus,
-            message: purpose,
-            blockchain_loan_id: loanId
-          }]);
-
-        if (insertError) console.error(`Failed to insert synced loan ${loanId}:`, insertError.message);
+        // Queue new synced record; all of them are written in one request below
+        newRecords.push({
+          borrower: borrowerId,
+          lender: lenderId,
+          amount: amount,
+          type: 'borrow',
+          status: blockchainStatus,
+          message: purpose,
+          blockchain_loan_id: loanId
+        });
       } else {
         // Update existing status
         const updateData = { status: blockchainStatus };
@@ -150,21 +235,35 @@ export const syncUserEvents = async (req, res) => {
       }
     }
 
-    // 2. Fetch LoanFunded events where user is lender
-    const fundedFilter = contract.filters.LoanFunded(null, walletAddress);
-    const fundedEvents = await contract.queryFilter(fundedFilter, -5000);
+    // Insert before the LoanFunded pass so its updates also reach freshly synced loans
+    // Rows that already exist (blockchain_loan_id is UNIQUE) are skipped rather than failing the batch
+    if (newRecords.length > 0) {
+      const upsertOptions = { onConflict: 'blockchain_loan_id', ignoreDuplicates: true };
+      const { error: batchError } = await supabase
+        .from('history')
+        .upsert(newRecords, upsertOptions);
 
-    for (const event of fundedEvents) {
-      const loanId = Number(event.args[0]);
-      const lenderAddr = event.args[1].toLowerCase();
-      const borrowerAddr = event.args[2].toLowerCase();
+      // The batch is one statement, so a single bad row rejects all of them; retry row by row
+      // so each failure only costs its own record
+      if (batchError) {
+        console.warn("Batch insert of synced loans failed, retrying individually:", batchError.message);
+        for (const record of newRecords) {
+          const { error: insertError } = await supabase
+            .from('history')
+            .upsert([record], upsertOptions);
 
-      const lenderId = addressToIdMap[lenderAddr];
-      const borrowerId = addressToIdMap[borrowerAddr];
+          if (insertError) console.error(`Failed to insert synced loan ${record.blockchain_loan_id}:`, insertError.message);
+        }
+      }
+    }
 
-      if (!lenderId || !borrowerId) continue;
+    // 2. Sync LoanFunded events where user is lender
+    for (const event of relevantFunded) {
+      const loanId = Number(event.args[0]);
+      const lenderId = addressToIdMap[event.args[1].toLowerCase()];
 
-      const blockchainLoan = await contract.getLoan(loanId);
+      const blockchainLoan = loansById.get(loanId);
+      if (!blockchainLoan) continue;
       const blockchainStatus = mapBlockchainStatus(Number(blockchainLoan.status));
 
       await supabase
@@ -198,9 +297,13 @@ export const pushScoreToChain = async (userWalletAddress, score) => {
   }
 
   try {
-    const provider = new ethers.JsonRpcProvider(providerUrl);
+    const { contract: readOnlyContract, provider } = await getContract();
+    if (!readOnlyContract) {
+      return { success: false, reason: "Failed to initialize blockchain provider" };
+    }
+    const ethers = await loadEthers();
     const wallet = new ethers.Wallet(adminPrivateKey, provider);
-    const contract = new ethers.Contract(contractAddress, NEXACRED_ABI, wallet);
+    const contract = readOnlyContract.connect(wallet);
 
     console.log(`Oracle pushing credit score update: ${userWalletAddress} -> ${score}`);
     const tx = await contract.updateUserCreditScore(userWalletAddress, score);
@@ -1,6 +1,6 @@
 // Port of the Python NexaCred Transaction Analyzer to native Node.js Express Controller
-import { ethers } from "ethers";
 import dotenv from "dotenv";
+import { createTtlLru } from "../utils/lruCache.js";
 
 dotenv.config();
 
@@ -58,6 +58,15 @@ const PROTOCOL_ADDRESSES = {
   "0xc011a73ee8576fb46f5e1c5751ca3b9fe0af2a6f": "Synthetix"
 };
 
+// Lookup tables read on every mock generation, built once from the constants above
+const PROTOCOL_NAMES = Object.keys(PROTOCOL_RISK_LEVELS);
+const METHOD_NAMES = Object.values(METHOD_SIGNATURES);
+
+// Reverse index of PROTOCOL_ADDRESSES (protocol name -> address)
+const PROTOCOL_ADDRESS_BY_NAME = Object.fromEntries(
+  Object.entries(PROTOCOL_ADDRESSES).map(([address, name]) => [name, address])
+);
+
 // A simple pseudo-random generator seeded by address hash
 const seededRandom = (seedString) => {
   let h = 1779033703 ^ seedString.length;
@@ -81,6 +90,17 @@ const sampleSize = (arr, size, randomFn) => {
   return shuffled.slice(0, size);
 };
 
+const HEX_DIGITS = "0123456789abcdef";
+
+// Build a "0x"-prefixed hex string into a preallocated digit buffer joined once
+const randomHex = (length, randomFn) => {
+  const digits = new Array(length);
+  for (let i = 0; i < length; i++) {
+    digits[i] = HEX_DIGITS[Math.floor(randomFn() * 16)];
+  }
+  return "0x" + digits.join('');
+};
+
 // Fetch mock transactions (fallback logic)
 const fetchMockTransactions = (walletAddress) => {
   const seed = walletAddress.toLowerCase();
@@ -94,9 +114,8 @@ const fetchMockTransactions = (walletAddress) => {
   const walletAgeDays = Math.floor(rand() * 810) + 90;
   const earliestTimestamp = currentTimestamp - (walletAgeDays * 86400);
   
-  const availableProtocols = Object.keys(PROTOCOL_RISK_LEVELS);
-  const numProtocols = Math.min(3 + (seed.charCodeAt(seed.length - 1) % 8), availableProtocols.length);
-  const usedProtocols = sampleSize(availableProtocols, numProtocols, rand);
+  const numProtocols = Math.min(3 + (seed.charCodeAt(seed.length - 1) % 8), PROTOCOL_NAMES.length);
+  const usedProtocols = sampleSize(PROTOCOL_NAMES, numProtocols, rand);
   
   for (let i = 0; i < numTransactions; i++) {
     const txTimestamp = earliestTimestamp + Math.floor(rand() * (currentTimestamp - earliestTimestamp));
@@ -104,18 +123,16 @@ const fetchMockTransactions = (walletAddress) => {
     
     if (isProtocolTx) {
       const protocol = sample(usedProtocols, rand);
-      let protocolAddress = Object.keys(PROTOCOL_ADDRESSES).find(
-        key => PROTOCOL_ADDRESSES[key] === protocol
-      );
+      let protocolAddress = PROTOCOL_ADDRESS_BY_NAME[protocol];
       
       if (!protocolAddress) {
-        protocolAddress = "0x" + Array.from({length: 40}, () => Math.floor(rand()*16).toString(16)).join('');
+        protocolAddress = randomHex(40, rand);
       }
       
-      const method = sample(Object.values(METHOD_SIGNATURES), rand);
+      const method = sample(METHOD_NAMES, rand);
       
       mockTransactions.push({
-        hash: "0x" + Array.from({length: 64}, () => Math.floor(rand()*16).toString(16)).join(''),
+        hash: randomHex(64, rand),
         from_address: walletAddress.toLowerCase(),
         to_address: protocolAddress.toLowerCase(),
         value: Math.floor(rand() * 1000000000000000000).toString(),
@@ -126,9 +143,9 @@ const fetchMockTransactions = (walletAddress) => {
       });
     } else {
       mockTransactions.push({
-        hash: "0x" + Array.from({length: 64}, () => Math.floor(rand()*16).toString(16)).join(''),
-        from_address: rand() < 0.5 ? walletAddress.toLowerCase() : "0x" + Array.from({length: 40}, () => Math.floor(rand()*16).toString(16)).join(''),
-        to_address: rand() < 0.5 ? "0x" + Array.from({length: 40}, () => Math.floor(rand()*16).toString(16)).join('') : walletAddress.toLowerCase(),
+        hash: randomHex(64, rand),
+        from_address: rand() < 0.5 ? walletAddress.toLowerCase() : randomHex(40, rand),
+        to_address: rand() < 0.5 ? randomHex(40, rand) : walletAddress.toLowerCase(),
         value: Math.floor(rand() * 1000000000000000000).toString(),
         gas_used: (Math.floor(rand() * 179000) + 21000).toString(),
         timestamp: txTimestamp
@@ -140,16 +157,37 @@ const fetchMockTransactions = (walletAddress) => {
   return mockTransactions.map(tx => ({ ...tx, _isMock: true }));
 };
 
+// Etherscan credentials, checked once at load rather than per analysis
+const ETHERSCAN_API_KEY = process.env.ETHERSCAN_API_KEY;
+const HAS_ETHERSCAN_API_KEY = Boolean(ETHERSCAN_API_KEY) && ETHERSCAN_API_KEY !== "YourEtherscanAPIKey";
+
+// Live Etherscan transaction lists per wallet, reused across repeat analyses.
+// txlist returns up to 10,000 transactions, so the cache is bounded by total cached
+// transactions, and lists too large to be worth holding are not cached at all.
+const TX_CACHE_TTL_MS = 5 * 60 * 1000;
+const TX_CACHE_MAX_ENTRIES = 200;
+const TX_CACHE_MAX_TRANSACTIONS = 20000;
+const TX_CACHE_MAX_LIST_LENGTH = 2000;
+const txCache = createTtlLru({
+  ttlMs: TX_CACHE_TTL_MS,
+  maxEntries: TX_CACHE_MAX_ENTRIES,
+  maxWeight: TX_CACHE_MAX_TRANSACTIONS,
+  weigh: transactions => transactions.length
+});
+
 // Fetch real transactions using Etherscan API with mock fallback
 const fetchTransactions = async (walletAddress) => {
-  const etherscanApiKey = process.env.ETHERSCAN_API_KEY;
-  if (!etherscanApiKey || etherscanApiKey === "YourEtherscanAPIKey") {
+  if (!HAS_ETHERSCAN_API_KEY) {
     console.log("Etherscan API key not set. Using mock transactions.");
     return fetchMockTransactions(walletAddress);
   }
 
+  const cacheKey = walletAddress.toLowerCase();
+  const cached = txCache.get(cacheKey);
+  if (cached) return cached;
+
   try {
-    const url = `https://api.etherscan.io/api?module=account&action=txlist&address=${walletAddress}&startblock=0&endblock=99999999&sort=asc&apikey=${etherscanApiKey}`;
+    const url = `https://api.etherscan.io/api?module=account&action=txlist&address=${walletAddress}&startblock=0&endblock=99999999&sort=asc&apikey=${ETHERSCAN_API_KEY}`;
     const response = await fetch(url);
     if (!response.ok) throw new Error(`HTTP error ${response.status}`);
     
@@ -165,7 +203,7 @@ const fetchTransactions = async (walletAddress) => {
     }
 
     // Map Etherscan transaction list to NexaCred schema
-    return result.result.map(tx => {
+    const transactions = result.result.map(tx => {
       const inputSig = tx.input && tx.input.length >= 10 ? tx.input.slice(0, 10).toLowerCase() : null;
       const method = inputSig ? METHOD_SIGNATURES[inputSig] : null;
       const protocol = tx.to ? PROTOCOL_ADDRESSES[tx.to.toLowerCase()] : null;
@@ -181,12 +219,20 @@ const fetchTransactions = async (walletAddress) => {
         protocol
       };
     });
+    // Only live results are cached; mock fallbacks are cheap and should retry Etherscan next time
+    if (transactions.length <= TX_CACHE_MAX_LIST_LENGTH) txCache.set(cacheKey, transactions);
+    return transactions;
   } catch (error) {
     console.error("Failed to fetch from Etherscan. Falling back to mock transactions. Error:", error.message);
     return fetchMockTransactions(walletAddress);
   }
 };
 
+// Wei -> ETH as a float, so the analyzer doesn't need ethers (and its multi-megabyte import)
+// just for formatEther. Parsing the exact decimal string rounds once, matching parseFloat(formatEther(wei)).
+const WEI_PER_ETH = 10n ** 18n;
+const weiToEth = (wei) => parseFloat(`${wei / WEI_PER_ETH}.${(wei % WEI_PER_ETH).toString().padStart(18, '0')}`);
+
 // Analyze transactions and generate risk report
 const analyzeTransactions = (walletAddress, transactions, isMock = false) => {
   const totalTransactions = transactions.length;
@@ -212,11 +258,12 @@ const analyzeTransactions = (walletAddress, transactions, isMock = false) => {
   const currentTimestamp = Math.floor(Date.now() / 1000);
   const walletAgeDays = Math.floor((currentTimestamp - firstTxTimestamp) / 86400);
   
-  const defiInteractions = transactions.filter(tx => tx.protocol).length;
-  
+  // DeFi interaction count is tallied in the same pass that groups protocol interactions
+  let defiInteractions = 0;
   const protocolInteractions = {};
   for (const tx of transactions) {
     if (tx.protocol) {
+      defiInteractions++;
       if (!protocolInteractions[tx.protocol]) {
         protocolInteractions[tx.protocol] = {
           count: 0,
@@ -230,8 +277,7 @@ const analyzeTransactions = (walletAddress, transactions, isMock = false) => {
       
       if (tx.from_address.toLowerCase() === walletAddress.toLowerCase()) {
         try {
-          const valStr = ethers.formatEther(BigInt(tx.value || "0"));
-          const valEth = parseFloat(valStr);
+          const valEth = weiToEth(BigInt(tx.value || "0"));
           if (!isNaN(valEth)) {
             protocolInteractions[tx.protocol].total_value += valEth;
           }
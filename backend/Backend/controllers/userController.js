@@ -3,7 +3,6 @@ import mockStore from '../config/mockStore.js';
 import bcrypt from "bcryptjs";  
 import jwt from "jsonwebtoken";
 import dotenv from "dotenv";
-import { ethers } from "ethers";
 import crypto from "crypto";
 
 dotenv.config();
@@ -12,6 +11,8 @@ dotenv.config();
 const PII_ALGORITHM = 'aes-256-cbc';
 const PII_ENCRYPTION_KEY = process.env.PII_ENCRYPTION_KEY || 'a_very_secret_32_byte_key_for_pii';
 const IV_LENGTH = 16;
+// Derived once; every encrypt/decrypt (two per mapped user) reuses it
+const PII_KEY = crypto.createHash('sha256').update(PII_ENCRYPTION_KEY).digest();
 
 const JWT_SECRET = process.env.JWT_SECRET;
 if (!JWT_SECRET && process.env.NODE_ENV === 'production') {
@@ -25,9 +26,8 @@ export function encryptPII(text) {
   if (typeof text !== 'string') text = String(text);
   if (text.startsWith('enc:')) return text;
   
-  const key = crypto.createHash('sha256').update(PII_ENCRYPTION_KEY).digest();
   const iv = crypto.randomBytes(IV_LENGTH);
-  const cipher = crypto.createCipheriv(PII_ALGORITHM, key, iv);
+  const cipher = crypto.createCipheriv(PII_ALGORITHM, PII_KEY, iv);
   let encrypted = cipher.update(text, 'utf8', 'hex');
   encrypted += cipher.final('hex');
   return `enc:${iv.toString('hex')}:${encrypted}`;
@@ -39,8 +39,7 @@ export function decryptPII(text) {
     const parts = text.split(':');
     const iv = Buffer.from(parts[1], 'hex');
     const encryptedText = Buffer.from(parts[2], 'hex');
-    const key = crypto.createHash('sha256').update(PII_ENCRYPTION_KEY).digest();
-    const decipher = crypto.createDecipheriv(PII_ALGORITHM, key, iv);
+    const decipher = crypto.createDecipheriv(PII_ALGORITHM, PII_KEY, iv);
     let decrypted = decipher.update(encryptedText, 'hex', 'utf8');
     decrypted += decipher.final('utf8');
     return decrypted;
@@ -98,6 +97,19 @@ const mapUserToCamelCase = (dbUser) => {
   };
 };
 
+// Columns read back for API responses: everything mapUserToCamelCase uses, and never password_hash.
+// Login is the only path that selects the hash.
+const USER_COLUMNS = [
+  'id', 'username', 'email', 'wallet_address', 'wallet_connected_at', 'last_wallet_activity',
+  'first_name', 'middle_name', 'last_name', 'father_or_spouse_name', 'date_of_birth', 'phone_number',
+  'pan', 'aadhaar', 'street_address', 'area_locality', 'city', 'state', 'pin_code', 'country',
+  'employment_status', 'occupation_category', 'company_name', 'years_of_experience', 'monthly_income_range',
+  'has_credit_accounts', 'credit_purpose', 'has_bank_account', 'primary_bank_name', 'existing_credit_score',
+  'terms_accepted', 'privacy_policy_accepted', 'consent_credit_bureau', 'age_verified', 'itr_status',
+  'educational_qualification', 'language_preference', 'communication_method', 'marital_status',
+  'number_of_dependents', 'created_at'
+].join(', ');
+
 const mapBodyToSnakeCase = (body) => {
   const mapping = {
     username: 'username',
@@ -187,25 +199,28 @@ export async function registerUser(req, res) {
       body.aadhaar = cleanAadhaar;
     }
 
-    // Check if user exists
-    const { data: existingUser, error: checkError } = await supabase
-      .from('users')
-      .select('username, email')
-      .or(`email.eq.${email},username.eq.${username}`)
-      .maybeSingle();
+    // Check if user exists while hashing the password; neither step depends on the other
+    const [{ data: existingUser, error: checkError }, passwordHash] = await Promise.all([
+      supabase
+        .from('users')
+        .select('username, email')
+        .or(`email.eq.${email},username.eq.${username}`)
+        .maybeSingle(),
+      bcrypt.genSalt(10).then(salt => bcrypt.hash(password, salt))
+    ]);
 
     if (checkError) throw checkError;
     if (existingUser) {
       return res.status(400).json({ error: "Username or Email already exists" });
     }
 
-    // Hash password
-    const salt = await bcrypt.genSalt(10);
-    const passwordHash = await bcrypt.hash(password, salt);
-
     // Prepare database fields
     const insertData = mapBodyToSnakeCase(body);
     insertData.password_hash = passwordHash;
+    // Store wallets lowercased, as walletAuth does, so address lookups match on exact values
+    if (typeof insertData.wallet_address === 'string') {
+      insertData.wallet_address = insertData.wallet_address.toLowerCase();
+    }
     if (insertData.pan) insertData.pan = encryptPII(insertData.pan);
     if (insertData.aadhaar) insertData.aadhaar = encryptPII(insertData.aadhaar);
 
@@ -215,7 +230,7 @@ export async function registerUser(req, res) {
       const { data: created, error: insertError } = await supabase
         .from('users')
         .insert([insertData])
-        .select()
+        .select(USER_COLUMNS)
         .single();
       if (insertError) throw insertError;
       newUser = created;
@@ -279,7 +294,7 @@ export async function getUsers(req, res) {
       try {
         const { data: fetched, error: fetchError } = await supabase
           .from('users')
-          .select('*')
+          .select(USER_COLUMNS)
           .eq('username', username)
           .maybeSingle();
         if (fetchError) throw fetchError;
@@ -305,7 +320,7 @@ export async function getUsers(req, res) {
     try {
       const { data: fetchedAll, error: fetchAllError } = await supabase
         .from('users')
-        .select('*');
+        .select(USER_COLUMNS);
       if (fetchAllError) throw fetchAllError;
       users = fetchedAll;
     } catch (dbErr) {
@@ -338,7 +353,7 @@ export async function getUserById(req, res) {
     try {
       const { data: fetched, error: fetchError } = await supabase
         .from('users')
-        .select('*')
+        .select(USER_COLUMNS)
         .eq('id', req.params.id)
         .maybeSingle();
       if (fetchError) throw fetchError;
@@ -436,11 +451,17 @@ export async function updateUser(req, res) {
     delete updateData.currentPassword;
     delete updateData.current_password;
 
+    // Hash the new password up front so it is written in the same update as the profile fields
+    if (req.body.password) {
+      const salt = await bcrypt.genSalt(10);
+      updateData.password_hash = await bcrypt.hash(req.body.password, salt);
+    }
+
     const { data: user, error: updateError } = await supabase
       .from('users')
       .update(updateData)
       .eq('id', req.params.id)
-      .select()
+      .select(USER_COLUMNS)
       .maybeSingle();
 
     if (updateError) throw updateError;
@@ -449,11 +470,6 @@ export async function updateUser(req, res) {
     // Rotate JWT token if password or identity changed
     let token = undefined;
     if (req.body.password) {
-      const salt = await bcrypt.genSalt(10);
-      const newHash = await bcrypt.hash(req.body.password, salt);
-      
-      await supabase.from('users').update({ password_hash: newHash }).eq('id', req.params.id);
-      
       token = jwt.sign(
         { userId: user.id, username: user.username, email: user.email, iat: Math.floor(Date.now() / 1000) },
         EFFECTIVE_JWT_SECRET,
@@ -488,16 +504,13 @@ export async function deleteUser(req, res) {
         .from('users')
         .delete()
         .eq('id', req.params.id)
-        .select()
+        .select('id')
         .maybeSingle();
 
       if (deleteError) throw deleteError;
       user = deleted;
     } catch (dbErr) {
-      user = mockStore.findUserById(req.params.id);
-      if (user) {
-        mockStore.users.delete(user._id || user.id);
-      }
+      user = mockStore.deleteUser(req.params.id);
     }
 
     if (!user) return res.status(404).json({ error: "User not found" });
@@ -537,7 +550,9 @@ export async function walletAuth(req, res) {
     }
 
     try {
-      const recoveredAddress = ethers.verifyMessage(message, signature);
+      // ethers is only needed here, so load it on first wallet login rather than at startup
+      const { verifyMessage } = await import("ethers");
+      const recoveredAddress = verifyMessage(message, signature);
       if (recoveredAddress.toLowerCase() !== walletAddress.toLowerCase()) {
         return res.status(400).json({ error: "Invalid signature" });
       }
@@ -553,7 +568,7 @@ export async function walletAuth(req, res) {
     try {
       const { data: fetched, error: fetchError } = await supabase
         .from('users')
-        .select('*')
+        .select(USER_COLUMNS)
         .eq('wallet_address', normalizedAddress)
         .maybeSingle();
       if (fetchError) throw fetchError;
@@ -568,14 +583,15 @@ export async function walletAuth(req, res) {
       const defaultPassword = Math.random().toString(36).substring(7);
       const salt = await bcrypt.genSalt(10);
       const passwordHash = await bcrypt.hash(defaultPassword, salt);
+      const connectedAt = new Date().toISOString();
       
       const insertData = {
         username: `wallet_${normalizedAddress.slice(-8).toLowerCase()}`,
         email: `${normalizedAddress}@nexacred.wallet`,
         password_hash: passwordHash,
         wallet_address: normalizedAddress,
-        wallet_connected_at: new Date().toISOString(),
-        last_wallet_activity: new Date().toISOString(),
+        wallet_connected_at: connectedAt,
+        last_wallet_activity: connectedAt,
         
         first_name: 'Wallet',
         last_name: 'User',
@@ -610,7 +626,7 @@ export async function walletAuth(req, res) {
         const { data: createdUser, error: insertError } = await supabase
           .from('users')
           .insert([insertData])
-          .select()
+          .select(USER_COLUMNS)
           .single();
         if (insertError) throw insertError;
         user = createdUser;
@@ -630,7 +646,7 @@ export async function walletAuth(req, res) {
           .from('users')
           .update({ last_wallet_activity: new Date().toISOString() })
           .eq('id', user.id)
-          .select()
+          .select(USER_COLUMNS)
           .single();
         if (updateError) throw updateError;
         user = updatedUser;
@@ -678,7 +694,7 @@ export async function getCurrentUser(req, res) {
     try {
       const { data: fetched, error } = await supabase
         .from('users')
-        .select('*')
+        .select(USER_COLUMNS)
         .eq('id', userId)
         .maybeSingle();
 
@@ -0,0 +1,45 @@
+// Sliding-window request limiter keyed by authenticated user (falling back to IP).
+// State lives in this process, so each server / warm serverless instance enforces
+// its own window - enough to stop one client from draining the external LLM quota.
+// Memory is bounded: idle clients are swept once per window and at most maxClients are tracked.
+export function rateLimit({ windowMs = 60 * 1000, max = 20, maxClients = 10000 } = {}) {
+  const hits = new Map(); // client key -> ascending request timestamps inside the window
+  let lastSweep = Date.now();
+
+  return (req, res, next) => {
+    const key = req.user?.userId || req.ip;
+    const now = Date.now();
+    const windowStart = now - windowMs;
+
+    // Drop clients whose newest request has already left the window
+    if (now - lastSweep >= windowMs) {
+      for (const [client, timestamps] of hits) {
+        if (timestamps[timestamps.length - 1] <= windowStart) hits.delete(client);
+      }
+      lastSweep = now;
+    }
+
+    const timestamps = hits.get(key) || [];
+    let expired = 0;
+    while (expired < timestamps.length && timestamps[expired] <= windowStart) expired++;
+    if (expired > 0) timestamps.splice(0, expired);
+
+    if (timestamps.length >= max) {
+      const retryAfterSeconds = Math.ceil((timestamps[0] + windowMs - now) / 1000);
+      res.set("Retry-After", String(retryAfterSeconds));
+      return res.status(429).json({
+        success: false,
+        error: "Too many requests. Please try again shortly."
+      });
+    }
+
+    timestamps.push(now);
+    // Re-insert so Map order tracks recency; the first key is then the least recently seen client
+    hits.delete(key);
+    if (hits.size >= maxClients) {
+      hits.delete(hits.keys().next().value);
+    }
+    hits.set(key, timestamps);
+    next();
+  };
+}
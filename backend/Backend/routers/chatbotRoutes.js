@@ -2,11 +2,19 @@ import express from 'express';
 import dotenv from 'dotenv';
 import supabase from '../config/supabaseClient.js';
 import { authenticateToken } from '../middleware/auth.js';
+import { rateLimit } from '../middleware/rateLimit.js';
+import { createTtlLru } from '../utils/lruCache.js';
 
 dotenv.config();
 
 const router = express.Router();
 
+// External LLM configuration, resolved once at load instead of on every query
+const CHATBOT_API_URL = process.env.CHATBOT_API_URL || "https://openrouter.ai/api/v1/chat/completions";
+const CHATBOT_API_KEY = process.env.CHATBOT_API_KEY;
+const CHATBOT_MODEL = process.env.CHATBOT_MODEL || "meta-llama/llama-3.1-8b-instruct:free";
+const CHATBOT_SYSTEM_PROMPT = "You are NexaCred AI, a professional financial assistant helping users with credit scoring, lending, and blockchain finance. Always answer accurately and politely based on the provided context if present.";
+
 // Local knowledge base for fallback mode
 const LOCAL_KNOWLEDGE_BASE = {
   "credit score": "A credit score is a numerical representation of your creditworthiness, typically ranging from 300 to 850. It is calculated based on payment history, credit utilization, length of credit history, types of credit accounts, and recent credit inquiries. Higher scores indicate lower credit risk.",
@@ -21,38 +29,252 @@ const LOCAL_KNOWLEDGE_BASE = {
   "interest rate": "Interest rates represent the cost of borrowing money, expressed as an annual percentage of the principal. Higher credit scores typically qualify for lower interest rates."
 };
 
+// Split knowledge base keys into keyword lists once instead of on every query
+const LOCAL_KNOWLEDGE_ENTRIES = Object.entries(LOCAL_KNOWLEDGE_BASE).map(([key, val]) => ({
+  keyWords: key.split(" "),
+  response: val
+}));
+
+// All knowledge-base keywords in one pattern. The zero-width lookahead reports a match at every
+// position, so overlapping keywords are still found, with the same substring semantics as includes()
+const LOCAL_KEYWORD_PATTERN = new RegExp(
+  `(?=(${[...new Set(LOCAL_KNOWLEDGE_ENTRIES.flatMap(e => e.keyWords))].join('|')}))`,
+  'g'
+);
+
 const GREETINGS = [
   "Hello! I'm your NexaCred AI assistant. How can I help you today?",
   "Hi there! I'm here to help with your financial and credit questions. What would you like to know?",
   "Welcome! I can assist you with information about credit scores, lending, and financial services. What is your question?"
 ];
 
+// Single compiled alternation, matched on word boundaries so "hi" no longer fires inside "this" or "which"
+const GREETING_PATTERN = /\b(?:hello|hi|hey|good morning|good afternoon|good evening)\b/;
+
+// Whole-message small talk answered directly, without touching the caches, Supabase or the LLM.
+// Keys are normalizeQuery output; greetings pick from GREETINGS.
+const DIRECT_GREETINGS = new Set(["hi", "hello", "hey", "hi there", "hello there", "good morning", "good afternoon", "good evening"]);
+const DIRECT_RESPONSES = new Map([
+  ["thanks", "You're welcome! Let me know if you have any other questions about credit or lending."],
+  ["thank you", "You're welcome! Let me know if you have any other questions about credit or lending."],
+  ["ok", "Great! Feel free to ask me anything about credit scores, loans, or NexaCred."],
+  ["okay", "Great! Feel free to ask me anything about credit scores, loans, or NexaCred."],
+  ["bye", "Goodbye! Come back any time you need help with your finances."],
+  ["goodbye", "Goodbye! Come back any time you need help with your finances."]
+]);
+
+const getDirectResponse = (q) => {
+  if (DIRECT_GREETINGS.has(q)) return GREETINGS[Math.floor(Math.random() * GREETINGS.length)];
+  return DIRECT_RESPONSES.get(q) || null;
+};
+
 const FALLBACK_RESPONSES = [
   "I understand you are looking for information. I recommend checking our official guidelines or contacting our support team for personalized assistance.",
   "That is a great question! For detailed information, I'd suggest exploring our help documentation or consulting with our advisors.",
   "I'd be happy to help. For the most accurate details, please refer to our official resources or reach out to customer support."
 ];
 
-// Perform local keyword query resolution
-const getLocalResponse = (query) => {
-  const q = query.toLowerCase();
-  
+// In-memory cache of external LLM answers keyed by the normalized query.
+// Retrieval depends only on the query, so the key also pins the context the answer was built from.
+const RESPONSE_CACHE_TTL_MS = 10 * 60 * 1000;
+const RESPONSE_CACHE_MAX_ENTRIES = 500;
+const responseCache = createTtlLru({ ttlMs: RESPONSE_CACHE_TTL_MS, maxEntries: RESPONSE_CACHE_MAX_ENTRIES });
+
+// Answers were built from whatever guidelines existed at the time; called when the table changes
+export const clearResponseCache = () => responseCache.clear();
+
+// Unicode-aware so Hindi, CJK, etc. keep their text (\p{M} covers Devanagari vowel signs and viramas).
+// Punctuation-only input normalizes to "", which must never be used as a cache key.
+const normalizeQuery = (query) => query.toLowerCase().replace(/[^\p{L}\p{M}\p{N}\s]/gu, ' ').replace(/\s+/g, ' ').trim();
+
+// Near-duplicate lookup: reworded repeats ("what's a credit score" / "credit score, what is it")
+// share the same content words, so compare token sets when the exact key misses
+const SIMILARITY_THRESHOLD = 0.85;
+const STOP_WORDS = new Set([
+  "a", "an", "the", "is", "are", "was", "what", "whats", "s", "how", "do", "does", "can", "could",
+  "i", "me", "my", "you", "your", "it", "its", "to", "of", "for", "in", "on", "and", "or", "please",
+  "tell", "about", "explain", "again"
+]);
+
+const toContentTokens = (key) => new Set(key.split(' ').filter(w => w && !STOP_WORDS.has(w)));
+
+const getCachedResponse = (key) => responseCache.get(key) || null;
+
+const setCachedResponse = (key, entry) => {
+  responseCache.set(key, { ...entry, tokens: toContentTokens(key) });
+};
+
+const findSimilarCachedResponse = (key) => {
+  const tokens = toContentTokens(key);
+  if (tokens.size === 0) return null;
+
+  let bestKey = null;
+  let bestScore = 0;
+  for (const [cachedKey, entry] of responseCache.freshEntries()) {
+    let shared = 0;
+    for (const token of tokens) {
+      if (entry.tokens.has(token)) shared++;
+    }
+    const score = shared / (tokens.size + entry.tokens.size - shared);
+    if (score > bestScore) {
+      bestScore = score;
+      bestKey = cachedKey;
+    }
+  }
+  if (bestScore < SIMILARITY_THRESHOLD) return null;
+  return responseCache.get(bestKey);
+};
+
+// Guideline rows change rarely, so retrieval results are cached per search-word key
+const RETRIEVAL_CACHE_TTL_MS = 10 * 60 * 1000;
+const RETRIEVAL_CACHE_MAX_ENTRIES = 500;
+const retrievalCache = createTtlLru({ ttlMs: RETRIEVAL_CACHE_TTL_MS, maxEntries: RETRIEVAL_CACHE_MAX_ENTRIES });
+
+// Called after the guidelines table changes (e.g. POST /api/guidelines/seed) so new rows are searched at once
+export const clearRetrievalCache = () => retrievalCache.clear();
+
+// Context retrieval from Supabase using PostgreSQL full-text search (uses GIN index)
+const retrieveGuidelines = async (query) => {
+  // Build a tsquery string from meaningful words (>3 chars)
+  const searchWords = query.split(/\s+/).filter(w => w.length > 3);
+  if (searchWords.length === 0) return [];
+
+  const cacheKey = searchWords.join(' ').toLowerCase();
+  const cached = retrievalCache.get(cacheKey);
+  if (cached) return cached;
+
+  try {
+    const tsQuery = searchWords.join(' | '); // OR-based full-text query
+
+    // Primary: full-text search using the GIN index on 'content'
+    const { data: ftsDocs, error: ftsError } = await supabase
+      .from('guidelines')
+      .select('title, content')
+      .textSearch('content', tsQuery, { type: 'websearch', config: 'english' })
+      .limit(3);
+
+    if (!ftsError && ftsDocs && ftsDocs.length > 0) {
+      const docs = ftsDocs.map(d => `[${d.title}] ${d.content}`);
+      retrievalCache.set(cacheKey, docs);
+      return docs;
+    }
+
+    // Fallback: ILIKE scan if FTS returns nothing (e.g. single-char queries)
+    // Sanitize kw to prevent PostgREST injection
+    const orClauses = searchWords.map(kw => {
+      const safeKw = kw.replace(/[%"]/g, '');
+      return `content.ilike.%${safeKw}%`;
+    }).join(',');
+    const { data: likeDocs, error: likeError } = await supabase
+      .from('guidelines')
+      .select('title, content')
+      .or(orClauses)
+      .limit(3);
+
+    const docs = likeDocs && likeDocs.length > 0 ? likeDocs.map(d => `[${d.title}] ${d.content}`) : [];
+    // Only cache hits: a miss may just mean the table hasn't been seeded yet, and an empty
+    // result caused by a database error must not be pinned either
+    if (docs.length > 0 && !ftsError && !likeError) retrievalCache.set(cacheKey, docs);
+    return docs;
+  } catch (dbError) {
+    console.warn("Could not query guidelines database:", dbError.message);
+    return [];
+  }
+};
+
+// Circuit breaker: after repeated upstream failures, skip the LLM for a cool-down period so
+// every query doesn't wait out the request timeout before falling back to local answers
+const LLM_FAILURE_THRESHOLD = 3;
+const LLM_COOLDOWN_MS = 30 * 1000;
+let llmConsecutiveFailures = 0;
+let llmCircuitOpenUntil = 0;
+
+const recordLLMFailure = () => {
+  llmConsecutiveFailures++;
+  if (llmConsecutiveFailures >= LLM_FAILURE_THRESHOLD) {
+    llmCircuitOpenUntil = Date.now() + LLM_COOLDOWN_MS;
+    llmConsecutiveFailures = 0;
+    console.warn(`External LLM failing; using local responses for ${LLM_COOLDOWN_MS / 1000}s`);
+  }
+};
+
+const isLLMAvailable = () => Boolean(CHATBOT_API_KEY) && Date.now() >= llmCircuitOpenUntil;
+
+// Ask the external OpenAI-compatible API; resolves to "" on any failure so callers fall back locally
+const requestLLMAnswer = async (query, retrievedDocs) => {
+  if (Date.now() < llmCircuitOpenUntil) return "";
+
+  try {
+    const contextStr = retrievedDocs.length > 0 ? `Context information:\n${retrievedDocs.join('\n\n')}\n\n` : "";
+
+    const response = await fetch(CHATBOT_API_URL, {
+      method: 'POST',
+      signal: AbortSignal.timeout(4000),
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${CHATBOT_API_KEY}`,
+        'HTTP-Referer': 'https://nexacred.vercel.app',
+        'X-Title': 'NexaCred AI Assistant'
+      },
+      body: JSON.stringify({
+        model: CHATBOT_MODEL,
+        messages: [
+          { role: "system", content: CHATBOT_SYSTEM_PROMPT },
+          { role: "user", content: `${contextStr}Question: ${query}` }
+        ],
+        temperature: 0.7,
+        max_tokens: 500
+      })
+    });
+
+    if (response.ok) {
+      const result = await response.json();
+      llmConsecutiveFailures = 0;
+      return result.choices?.[0]?.message?.content || "";
+    }
+    const errText = await response.text();
+    console.warn(`External LLM returned status ${response.status}: ${errText}`);
+  } catch (apiError) {
+    console.error("Failed to fetch response from external LLM:", apiError.message);
+  }
+  recordLLMFailure();
+  return "";
+};
+
+// Concurrent requests for the same normalized query share one in-flight LLM call.
+// An empty key (punctuation-only input) says nothing about the question, so it is never shared.
+const inflightAnswers = new Map();
+
+const getLLMAnswer = (key, query, retrievedDocs) => {
+  if (!key) return requestLLMAnswer(query, retrievedDocs);
+
+  let pending = inflightAnswers.get(key);
+  if (!pending) {
+    pending = requestLLMAnswer(query, retrievedDocs).finally(() => inflightAnswers.delete(key));
+    inflightAnswers.set(key, pending);
+  }
+  return pending;
+};
+
+// Perform local keyword query resolution; expects the query already passed through normalizeQuery
+const getLocalResponse = (q) => {
   // Check greetings
-  const greetings = ["hello", "hi", "hey", "good morning", "good afternoon", "good evening"];
-  if (greetings.some(g => q.includes(g))) {
+  if (GREETING_PATTERN.test(q)) {
     return GREETINGS[Math.floor(Math.random() * GREETINGS.length)];
   }
 
-  // Check matching keywords in local knowledge base
+  // Find every keyword present in a single pass, then score entries by set lookups
+  const foundWords = new Set();
+  for (const match of q.matchAll(LOCAL_KEYWORD_PATTERN)) foundWords.add(match[1]);
+
   let bestMatch = null;
   let maxMatches = 0;
 
-  for (const [key, val] of Object.entries(LOCAL_KNOWLEDGE_BASE)) {
-    const keyWords = key.split(" ");
-    const matches = keyWords.filter(word => q.includes(word)).length;
+  for (const { keyWords, response } of LOCAL_KNOWLEDGE_ENTRIES) {
+    const matches = keyWords.filter(word => foundWords.has(word)).length;
     if (matches > maxMatches) {
       maxMatches = matches;
-      bestMatch = val;
+      bestMatch = response;
     }
   }
 
@@ -64,7 +286,7 @@ const getLocalResponse = (query) => {
  * POST /api/chatbot/query
  * Process user query through RAG pipeline / LLM endpoint / local fallback
  */
-router.post('/query', authenticateToken, async (req, res) => {
+router.post('/query', authenticateToken, rateLimit({ windowMs: 60 * 1000, max: 20 }), async (req, res) => {
   try {
     const { query, userId } = req.body;
 
@@ -78,105 +300,81 @@ router.post('/query', authenticateToken, async (req, res) => {
     const sanitizedQuery = query.trim().substring(0, 1000);
     console.log(`Processing chatbot query: "${sanitizedQuery.substring(0, 50)}..."`);
 
-    // 1. Context retrieval from Supabase using PostgreSQL full-text search (uses GIN index)
-    let retrievedDocs = [];
-    try {
-      // Build a tsquery string from meaningful words (>3 chars)
-      const searchWords = sanitizedQuery.split(/\s+/).filter(w => w.length > 3);
-
-      if (searchWords.length > 0) {
-        const tsQuery = searchWords.join(' | '); // OR-based full-text query
-
-        // Primary: full-text search using the GIN index on 'content'
-        const { data: ftsDocs, error: ftsError } = await supabase
-          .from('guidelines')
-          .select('title, content')
-          .textSearch('content', tsQuery, { type: 'websearch', config: 'english' })
-          .limit(3);
-
-        if (!ftsError && ftsDocs && ftsDocs.length > 0) {
-          retrievedDocs = ftsDocs.map(d => `[${d.title}] ${d.content}`);
-        } else {
-          // Fallback: ILIKE scan if FTS returns nothing (e.g. single-char queries)
-          // Sanitize kw to prevent PostgREST injection
-          const orClauses = searchWords.map(kw => {
-            const safeKw = kw.replace(/[%"]/g, '');
-            return `content.ilike.%${safeKw}%`;
-          }).join(',');
-          const { data: likeDocs } = await supabase
-            .from('guidelines')
-            .select('title, content')
-            .or(orClauses)
-            .limit(3);
-
-          if (likeDocs && likeDocs.length > 0) {
-            retrievedDocs = likeDocs.map(d => `[${d.title}] ${d.content}`);
-          }
+    const cacheKey = normalizeQuery(sanitizedQuery);
+
+    // 0a. Greetings and acknowledgements get a canned reply straight away
+    const directAnswer = getDirectResponse(cacheKey);
+    if (directAnswer) {
+      return res.json({
+        success: true,
+        data: {
+          query: sanitizedQuery,
+          response: directAnswer,
+          retrievedDocuments: 0,
+          contextUsed: false,
+          sources: ["Local Fallback System"],
+          serviceType: "local_fallback",
+          timestamp: new Date().toISOString(),
+          userId
         }
-      }
-    } catch (dbError) {
-      console.warn("Could not query guidelines database:", dbError.message);
+      });
     }
 
+    // 0b. Serve repeated questions from the response cache, skipping retrieval and the LLM round-trip
+    const cached = cacheKey ? getCachedResponse(cacheKey) || findSimilarCachedResponse(cacheKey) : null;
+    if (cached) {
+      return res.json({
+        success: true,
+        data: {
+          query: sanitizedQuery,
+          response: cached.response,
+          retrievedDocuments: cached.retrievedDocuments,
+          contextUsed: cached.retrievedDocuments > 0,
+          sources: cached.sources,
+          serviceType: "external_llm",
+          cached: true,
+          timestamp: new Date().toISOString(),
+          userId
+        }
+      });
+    }
+
+    // 1. Context retrieval from Supabase (cached per distinct set of search words).
+    // Retrieved guidelines only feed the LLM prompt, so skip the lookup when the LLM won't be called.
+    const useLLM = isLLMAvailable();
+    const retrievedDocs = useLLM ? await retrieveGuidelines(sanitizedQuery) : [];
+
     // 2. Query external OpenAI-compatible API if configured
-    const apiUrl = process.env.CHATBOT_API_URL || "https://openrouter.ai/api/v1/chat/completions";
-    const apiKey = process.env.CHATBOT_API_KEY;
-    const model = process.env.CHATBOT_MODEL || "meta-llama/llama-3.1-8b-instruct:free";
-
-    if (apiKey) {
-      try {
-        const contextStr = retrievedDocs.length > 0 ? `Context information:\n${retrievedDocs.join('\n\n')}\n\n` : "";
-        const systemPrompt = `You are NexaCred AI, a professional financial assistant helping users with credit scoring, lending, and blockchain finance. Always answer accurately and politely based on the provided context if present.`;
-
-        const response = await fetch(apiUrl, {
-          method: 'POST',
-          signal: AbortSignal.timeout(4000),
-          headers: {
-            'Content-Type': 'application/json',
-            'Authorization': `Bearer ${apiKey}`,
-            'HTTP-Referer': 'https://nexacred.vercel.app',
-            'X-Title': 'NexaCred AI Assistant'
-          },
-          body: JSON.stringify({
-            model: model,
-            messages: [
-              { role: "system", content: systemPrompt },
-              { role: "user", content: `${contextStr}Question: ${sanitizedQuery}` }
-            ],
-            temperature: 0.7,
-            max_tokens: 500
-          })
-        });
+    if (useLLM) {
+      const answer = await getLLMAnswer(cacheKey, sanitizedQuery, retrievedDocs);
+      if (answer) {
+        const sources = retrievedDocs.map((_, i) => `Guideline Source ${i + 1}`);
+        if (cacheKey) {
+          setCachedResponse(cacheKey, {
+            response: answer,
+            retrievedDocuments: retrievedDocs.length,
+            sources
+          });
+        }
 
-        if (response.ok) {
-          const result = await response.json();
-          const answer = result.choices?.[0]?.message?.content || "";
-          if (answer) {
-            return res.json({
-              success: true,
-              data: {
-                query: sanitizedQuery,
-                response: answer,
-                retrievedDocuments: retrievedDocs.length,
-                contextUsed: retrievedDocs.length > 0,
-                sources: retrievedDocs.map((_, i) => `Guideline Source ${i + 1}`),
-                serviceType: "external_llm",
-                timestamp: new Date().toISOString(),
-                userId
-              }
-            });
+        return res.json({
+          success: true,
+          data: {
+            query: sanitizedQuery,
+            response: answer,
+            retrievedDocuments: retrievedDocs.length,
+            contextUsed: retrievedDocs.length > 0,
+            sources,
+            serviceType: "external_llm",
+            timestamp: new Date().toISOString(),
+            userId
           }
-        } else {
-          const errText = await response.text();
-          console.warn(`External LLM returned status ${response.status}: ${errText}`);
-        }
-      } catch (apiError) {
-        console.error("Failed to fetch response from external LLM:", apiError.message);
+        });
       }
     }
 
     // 3. Fallback to intelligent local keyword-matching
-    const fallbackAnswer = getLocalResponse(sanitizedQuery);
+    const fallbackAnswer = getLocalResponse(cacheKey);
     res.json({
       success: true,
       data: {
@@ -200,23 +398,37 @@ router.post('/query', authenticateToken, async (req, res) => {
   }
 });
 
+// Static parts of the status/welcome payloads; only the timestamp changes per request
+const STATUS_INFO = Object.freeze({
+  status: 'online',
+  service: 'NexaCred Chatbot Gateway',
+  version: '2.0.0',
+  features: Object.freeze([
+    'Supabase Document Search',
+    'Generic OpenAI-compatible Wrapper Support',
+    'Local Intelligent Fallback'
+  ])
+});
+
+const WELCOME_INFO = Object.freeze({
+  message: "Hello! I'm your NexaCred AI assistant. I can help you with questions about credit scoring, lending, financial information, and more.",
+  suggestions: Object.freeze([
+    "What is a credit score?",
+    "How can I improve my credit rating?",
+    "What factors affect lending decisions?",
+    "Tell me about NexaCred's services",
+    "What is blockchain technology?",
+    "What do I need for a loan application?"
+  ])
+});
+
 /**
  * GET /api/chatbot/status
  */
 router.get('/status', (req, res) => {
   res.json({
     success: true,
-    data: {
-      status: 'online',
-      service: 'NexaCred Chatbot Gateway',
-      version: '2.0.0',
-      features: [
-        'Supabase Document Search',
-        'Generic OpenAI-compatible Wrapper Support',
-        'Local Intelligent Fallback'
-      ],
-      timestamp: new Date().toISOString()
-    }
+    data: { ...STATUS_INFO, timestamp: new Date().toISOString() }
   });
 });
 
@@ -226,18 +438,7 @@ router.get('/status', (req, res) => {
 router.get('/welcome', (req, res) => {
   res.json({
     success: true,
-    data: {
-      message: "Hello! I'm your NexaCred AI assistant. I can help you with questions about credit scoring, lending, financial information, and more.",
-      suggestions: [
-        "What is a credit score?",
-        "How can I improve my credit rating?",
-        "What factors affect lending decisions?",
-        "Tell me about NexaCred's services",
-        "What is blockchain technology?",
-        "What do I need for a loan application?"
-      ],
-      timestamp: new Date().toISOString()
-    }
+    data: { ...WELCOME_INFO, timestamp: new Date().toISOString() }
   });
 });
 
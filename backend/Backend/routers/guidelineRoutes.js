@@ -1,6 +1,7 @@
 import express from "express";
 import supabase from "../config/supabaseClient.js";
 import { authenticateToken } from "../middleware/auth.js";
+import { clearResponseCache, clearRetrievalCache } from "./chatbotRoutes.js";
 
 const router = express.Router();
 
@@ -62,6 +63,10 @@ router.post("/seed", authenticateToken, async (req, res) => {
 
     if (error) throw error;
 
+    // Drop cached chatbot retrievals and answers so the new rows are used immediately
+    clearRetrievalCache();
+    clearResponseCache();
+
     res.json({
       success: true,
       message: `Seeded ${data?.length ?? 0} guideline entries into the RAG knowledge base.`,
@@ -0,0 +1,57 @@
+// In-process cache with a per-entry TTL and least-recently-used eviction.
+// A Map iterates in insertion order, so re-inserting a key on every hit keeps the
+// least recently used key first - that is the one dropped when the cache is full.
+// Optionally bounded by total weight as well as entry count (e.g. weigh = list length),
+// so a few very large values cannot grow the cache without limit.
+export function createTtlLru({ ttlMs, maxEntries, maxWeight = Infinity, weigh = () => 1 }) {
+  const entries = new Map(); // key -> { value, weight, cachedAt }
+  let totalWeight = 0;
+
+  const isFresh = (entry, now = Date.now()) => now - entry.cachedAt <= ttlMs;
+
+  const remove = (key) => {
+    const entry = entries.get(key);
+    if (!entry) return;
+    entries.delete(key);
+    totalWeight -= entry.weight;
+  };
+
+  return {
+    get(key) {
+      const entry = entries.get(key);
+      if (!entry) return undefined;
+      entries.delete(key);
+      if (!isFresh(entry)) {
+        totalWeight -= entry.weight;
+        return undefined;
+      }
+      entries.set(key, entry);
+      return entry.value;
+    },
+
+    set(key, value) {
+      remove(key);
+      const weight = weigh(value);
+      if (weight > maxWeight) return; // Too large to cache at all
+
+      while (entries.size > 0 && (entries.size >= maxEntries || totalWeight + weight > maxWeight)) {
+        remove(entries.keys().next().value);
+      }
+      entries.set(key, { value, weight, cachedAt: Date.now() });
+      totalWeight += weight;
+    },
+
+    clear() {
+      entries.clear();
+      totalWeight = 0;
+    },
+
+    // Unexpired [key, value] pairs, least recently used first; iterating does not touch recency
+    *freshEntries() {
+      const now = Date.now();
+      for (const [key, entry] of entries) {
+        if (isFresh(entry, now)) yield [key, entry.value];
+      }
+    }
+  };
+}
@@ -5,8 +5,7 @@ from web3.middleware import geth_poa_middleware
 from datetime import datetime
 import logging
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Module logger only; handler setup is left to the importing application (see __main__ below)
 logger = logging.getLogger(__name__)
 
 class NexaCredBlockchain:
@@ -431,6 +430,7 @@ def create_production_client():
 
 # Testing and demonstration
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     print("=== NexaCred Blockchain Integration Test ===")
     
     # Test blockchain connection
@@ -6,6 +6,15 @@ import RiskReport from '../components/RiskReport';
 import { apiFetch } from "../utils/api.js";
 import useNexaCredContract from '../hooks/useNexaCredContract';
 
+// Chat transcript is capped so long sessions don't grow the message list (and rendered DOM) without bound
+const MAX_CHAT_MESSAGES = 100;
+
+const appendChatMessage = (messages, message) => (
+  messages.length >= MAX_CHAT_MESSAGES
+    ? [...messages.slice(messages.length - MAX_CHAT_MESSAGES + 1), message]
+    : [...messages, message]
+);
+
 export default function Dashboard({ user, wallet, walletUser, onUserUpdate }) {
   const contractHelper = useNexaCredContract(wallet?.signer, wallet?.chainId);
   // Chatbot state
@@ -260,7 +269,7 @@ export default function Dashboard({ user, wallet, walletUser, onUserUpdate }) {
       message: userMessage,
       timestamp: new Date().toISOString()
     };
-    setChatMessages(prev => [...prev, newUserMessage]);
+    setChatMessages(prev => appendChatMessage(prev, newUserMessage));
 
     try {
       // Call the RAG chatbot API
@@ -288,7 +297,7 @@ export default function Dashboard({ user, wallet, walletUser, onUserUpdate }) {
           contextUsed: data.data.contextUsed,
           sources: data.data.sources
         };
-        setChatMessages(prev => [...prev, botMessage]);
+        setChatMessages(prev => appendChatMessage(prev, botMessage));
         setChatStatus('online');
       } else {
         // Handle error response
@@ -299,7 +308,7 @@ export default function Dashboard({ user, wallet, walletUser, onUserUpdate }) {
           timestamp: new Date().toISOString(),
           isError: true
         };
-        setChatMessages(prev => [...prev, errorMessage]);
+        setChatMessages(prev => appendChatMessage(prev, errorMessage));
         setChatStatus('online');
       }
     } catch (error) {
@@ -312,7 +321,7 @@ export default function Dashboard({ user, wallet, walletUser, onUserUpdate }) {
         timestamp: new Date().toISOString(),
         isError: true
       };
-      setChatMessages(prev => [...prev, errorMessage]);
+      setChatMessages(prev => appendChatMessage(prev, errorMessage));
       setChatStatus('offline');
     } finally {
       setChatLoading(false);
@@ -988,12 +997,14 @@ export default function Dashboard({ user, wallet, walletUser, onUserUpdate }) {
                           setProfileModalHistory([]);
                           setProfileModalHistoryLoading(true);
                           try {
-                            const res = await apiFetch(`/users/${req.borrower?._id}`);
+                            // Profile and history are independent, so request both at once
+                            const [res, hres] = await Promise.all([
+                              apiFetch(`/users/${req.borrower?._id}`),
+                              apiFetch(`/history/user/${req.borrower?._id}`)
+                            ]);
                             if (res.ok) {
                               const data = await res.json();
                               setProfileModalUser(data || null);
-                              // Fetch history for this user
-                              const hres = await apiFetch(`/history/user/${req.borrower?._id}`);
                               if (hres.ok) {
                                 const hdata = await hres.json();
                                 setProfileModalHistory(hdata.history || []);